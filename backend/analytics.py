@@ -0,0 +1,193 @@
+import logging
+import time
+from datetime import datetime, timezone
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+DIRECTIONS = {
+    "Standing": "standing",
+    "Moving Left": "moving_left",
+    "Moving Right": "moving_right",
+    "Moving Up": "moving_up",
+    "Moving Down": "moving_down",
+}
+
+# Bucket width in seconds for each rollup table
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+
+METRIC_COLUMNS = ["samples", "count_sum", "count_min", "count_max", "motion_frames", "new_tracks"] + list(DIRECTIONS.values())
+
+
+def _table(resolution):
+    return f"occupancy_{resolution}"
+
+
+async def init_analytics_db(db):
+    """Create the per-resolution occupancy tables on an open connection"""
+    direction_cols = ",\n".join(f"                {c} INTEGER NOT NULL DEFAULT 0" for c in DIRECTIONS.values())
+    for resolution in RESOLUTIONS:
+        await db.execute(f'''
+            CREATE TABLE IF NOT EXISTS {_table(resolution)} (
+                camera_id TEXT NOT NULL,
+                bucket_start INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                count_sum INTEGER NOT NULL,
+                count_min INTEGER NOT NULL,
+                count_max INTEGER NOT NULL,
+                motion_frames INTEGER NOT NULL,
+                new_tracks INTEGER NOT NULL,
+{direction_cols},
+                PRIMARY KEY (camera_id, bucket_start)
+            )
+        ''')
+
+
+def _upsert_sql(resolution):
+    cols = ", ".join(["camera_id", "bucket_start"] + METRIC_COLUMNS)
+    placeholders = ", ".join("?" for _ in range(len(METRIC_COLUMNS) + 2))
+    updates = []
+    for c in METRIC_COLUMNS:
+        if c == "count_min":
+            updates.append(f"{c} = MIN({c}, excluded.{c})")
+        elif c == "count_max":
+            updates.append(f"{c} = MAX({c}, excluded.{c})")
+        else:
+            updates.append(f"{c} = {c} + excluded.{c}")
+    return (f"INSERT INTO {_table(resolution)} ({cols}) VALUES ({placeholders}) "
+            f"ON CONFLICT(camera_id, bucket_start) DO UPDATE SET {', '.join(updates)}")
+
+
+class _Bucket:
+    __slots__ = ["start"] + METRIC_COLUMNS
+
+    def __init__(self, start):
+        self.start = start
+        for c in METRIC_COLUMNS:
+            setattr(self, c, 0)
+        self.count_min = None
+
+    def values(self):
+        return [getattr(self, c) for c in METRIC_COLUMNS]
+
+
+class OccupancyAggregator:
+    """Aggregates per-frame occupancy into per-minute buckets per camera.
+
+    Closed minute buckets are queued and written to SQLite in batches; the
+    hourly and daily rollups are upserted in the same transaction, so range
+    queries never have to scan raw samples.
+    """
+
+    def __init__(self, db_path, batch_size=10, flush_interval=60.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._open = {}
+        self._last_track_id = {}
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._sql = {r: _upsert_sql(r) for r in RESOLUTIONS}
+
+    def record(self, camera_id, count, motion, object_ids, direction_counts, ts=None):
+        """Add one processed frame to the open minute bucket of camera_id"""
+        ts = int(ts if ts is not None else time.time())
+        minute = ts - ts % RESOLUTIONS["minute"]
+
+        bucket = self._open.get(camera_id)
+        if bucket is None or bucket.start != minute:
+            if bucket is not None:
+                self._pending.append((camera_id, bucket))
+            bucket = self._open[camera_id] = _Bucket(minute)
+
+        bucket.samples += 1
+        bucket.count_sum += count
+        bucket.count_min = count if bucket.count_min is None else min(bucket.count_min, count)
+        bucket.count_max = max(bucket.count_max, count)
+        if motion:
+            bucket.motion_frames += 1
+
+        # Tracker IDs are handed out monotonically, so anything above the last seen ID is new
+        last_id = self._last_track_id.get(camera_id, -1)
+        new_ids = [i for i in object_ids if i > last_id]
+        if new_ids:
+            bucket.new_tracks += len(new_ids)
+            self._last_track_id[camera_id] = max(new_ids)
+
+        for direction, n in direction_counts.items():
+            column = DIRECTIONS.get(direction)
+            if column:
+                setattr(bucket, column, getattr(bucket, column) + n)
+
+    def should_flush(self):
+        if not self._pending:
+            return False
+        return len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval
+
+    async def flush(self, close_open=False):
+        """Write queued minute buckets and fold them into the hour/day rollups"""
+        if close_open:
+            self._pending.extend(self._open.items())
+            self._open = {}
+        if not self._pending:
+            return 0
+
+        pending, self._pending = self._pending, []
+        rows = {r: [] for r in RESOLUTIONS}
+        for camera_id, bucket in pending:
+            values = bucket.values()
+            for resolution, width in RESOLUTIONS.items():
+                rows[resolution].append([camera_id, bucket.start - bucket.start % width] + values)
+
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                for resolution, params in rows.items():
+                    await db.executemany(self._sql[resolution], params)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Analytics flush failed: {e}")
+            self._pending = pending + self._pending
+            return 0
+        self._last_flush = time.monotonic()
+        return len(pending)
+
+
+def pick_resolution(start, end):
+    span = end - start
+    if span > 3 * RESOLUTIONS["day"]:
+        return "day"
+    if span > 6 * RESOLUTIONS["hour"]:
+        return "hour"
+    return "minute"
+
+
+async def query_occupancy(db_path, start, end, resolution, camera_id=None):
+    """Read rollup buckets in [start, end) for one or all cameras"""
+    sql = f"SELECT camera_id, bucket_start, {', '.join(METRIC_COLUMNS)} FROM {_table(resolution)} WHERE bucket_start >= ? AND bucket_start < ?"
+    params = [start - start % RESOLUTIONS[resolution], end]
+    if camera_id is not None:
+        sql += " AND camera_id = ?"
+        params.append(camera_id)
+    sql += " ORDER BY bucket_start, camera_id"
+
+    async with aiosqlite.connect(db_path) as db:
+        cursor = await db.execute(sql, params)
+        rows = await cursor.fetchall()
+
+    buckets = []
+    for r in rows:
+        m = dict(zip(METRIC_COLUMNS, r[2:]))
+        samples = m["samples"] or 1
+        buckets.append({
+            "camera_id": r[0],
+            "bucket_start": datetime.fromtimestamp(r[1], timezone.utc).isoformat(),
+            "samples": m["samples"],
+            "min_count": m["count_min"],
+            "max_count": m["count_max"],
+            "avg_count": round(m["count_sum"] / samples, 2),
+            "motion_ratio": round(m["motion_frames"] / samples, 3),
+            "new_tracks": m["new_tracks"],
+            "direction_counts": {name: m[col] for name, col in DIRECTIONS.items()},
+        })
+    return buckets
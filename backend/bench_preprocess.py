@@ -0,0 +1,109 @@
+"""Compare the legacy per-frame preprocessing against FramePreprocessor.
+
+Usage: python bench_preprocess.py [frames] [width] [height] [runs]
+"""
+import statistics
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from preprocessing import FramePreprocessor
+
+
+def make_frames(count, width, height):
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = base.copy()
+        x = (i * 15) % (width - 120)
+        cv2.rectangle(frame, (x, height // 3), (x + 120, height // 3 + 240), (255, 255, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+def legacy_step(fgbg, frame):
+    height, width = frame.shape[:2]
+    small_frame = cv2.resize(frame, (640, int(height * (640/width)))) if width > 640 else frame
+    gray = cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY)
+    rgb = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    mask = fgbg.apply(small_frame)
+    _, mask = cv2.threshold(mask, 250, 255, cv2.THRESH_BINARY)
+    dilated = cv2.dilate(mask, None, iterations=2)
+    return small_frame, gray, rgb, dilated
+
+
+def buffered_step(fgbg, prep, frame):
+    prep.process(frame)
+    dilated = prep.foreground_mask(fgbg)
+    return prep.small, prep.gray, prep.rgb, dilated
+
+
+def time_run(frames, step):
+    start = time.perf_counter()
+    for frame in frames:
+        step(frame)
+    return (time.perf_counter() - start) / len(frames) * 1000
+
+
+def allocations(frames, step, samples=20):
+    """Mean (blocks, bytes) allocated per frame, from tracemalloc snapshot diffs"""
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    blocks = size = 0
+    tracemalloc.start()
+    for frame in frames[:samples]:
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        # Hold the outputs so the arrays made for this frame are still alive in the diff
+        out = step(frame)
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+        for stat in after.compare_to(before, 'lineno'):
+            if stat.size_diff > 0:
+                blocks += max(stat.count_diff, 0)
+                size += stat.size_diff
+        del out, before, after
+    tracemalloc.stop()
+    n = min(samples, len(frames))
+    return blocks / n, size / n
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 1920
+    height = int(sys.argv[3]) if len(sys.argv) > 3 else 1080
+    runs = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+    frames = make_frames(count, width, height)
+    print(f"{count} frames at {width}x{height}, {runs} runs per variant")
+
+    legacy_fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=25, detectShadows=True)
+    buffered_fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=25, detectShadows=True)
+    prep = FramePreprocessor(target_width=640)
+    variants = {
+        "legacy": lambda f: legacy_step(legacy_fgbg, f),
+        "buffered": lambda f: buffered_step(buffered_fgbg, prep, f),
+    }
+
+    # Warm up so one-off buffer allocation is not counted per frame
+    for step in variants.values():
+        step(frames[0])
+
+    # Alternate which variant goes first so neither always gets the cold run
+    times = {name: [] for name in variants}
+    for i in range(runs):
+        order = list(variants) if i % 2 == 0 else list(reversed(variants))
+        for name in order:
+            times[name].append(time_run(frames, variants[name]))
+
+    for name, step in variants.items():
+        blocks, size = allocations(frames, step)
+        print(f"{name:>10}: median {statistics.median(times[name]):.2f} ms/frame "
+              f"(min {min(times[name]):.2f}, max {max(times[name]):.2f}), "
+              f"{blocks:.1f} allocations / {size / 1024:.0f} KiB per frame")
+
+    print(f"median speedup {statistics.median(times['legacy']) / statistics.median(times['buffered']):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
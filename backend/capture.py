@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureSource:
+    """Grabs frames from one video source on a background thread.
+
+    Only the newest frame is kept (latest-frame semantics), stamped with a
+    monotonic capture time, so consumers never work through a stale backlog
+    in the OpenCV buffer. A dropped source is reopened with exponential backoff.
+    """
+
+    def __init__(self, source=0, min_backoff=0.5, max_backoff=10.0, max_failures=5):
+        self.source = source
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_failures = max_failures
+
+        self._capture = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self._frame = None
+        self._frame_time = 0.0
+        self._frame_seq = 0
+        self.connected = False
+        self.reconnects = 0
+
+        # Exponentially weighted capture FPS
+        self._fps = 0.0
+        self._last_grab = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.source}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        if self._thread:
+            # The grab thread releases the device itself once it sees the stop flag
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            self._frame = None
+            self._last_grab = None
+            self._fps = 0.0
+            self.connected = False
+
+    def read(self):
+        """Return (frame, capture_time, seq) for the newest frame, or (None, 0.0, seq)"""
+        with self._lock:
+            return self._frame, self._frame_time, self._frame_seq
+
+    def stats(self):
+        with self._lock:
+            age = time.monotonic() - self._frame_time if self._frame is not None else None
+            return {
+                "connected": self.connected,
+                "capture_fps": round(self._fps, 1),
+                "frame_age_ms": round(age * 1000, 1) if age is not None else None,
+                "reconnects": self.reconnects,
+            }
+
+    def _open(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            capture.release()
+            return False
+        # Keep the driver-side queue as short as the backend allows
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._capture = capture
+        return True
+
+    def _release(self):
+        if self._capture is not None:
+            try:
+                self._capture.release()
+            except Exception:
+                pass
+            self._capture = None
+
+    def _run(self):
+        backoff = self.min_backoff
+        failures = 0
+        while not self._stop.is_set():
+            if self._capture is None:
+                if not self._open():
+                    logger.warning(f"Capture source {self.source} unavailable, retrying in {backoff:.1f}s")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+                if self._frame_seq:
+                    self.reconnects += 1
+                    logger.info(f"Capture source {self.source} reconnected")
+                failures = 0
+
+            ret, frame = self._capture.read()
+            now = time.monotonic()
+            if not ret or frame is None:
+                failures += 1
+                if failures >= self.max_failures:
+                    logger.warning(f"Capture source {self.source} dropped after {failures} failed reads, "
+                                   f"reopening in {backoff:.1f}s")
+                    self._release()
+                    with self._lock:
+                        self._frame = None
+                        self._last_grab = None
+                        self._fps = 0.0
+                        self.connected = False
+                    # Sources that open fine but never deliver (EOF, stalled stream) back off too
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            # Only a delivered frame proves the source healthy again
+            failures = 0
+            backoff = self.min_backoff
+            with self._lock:
+                if self._last_grab is not None:
+                    dt = now - self._last_grab
+                    if dt > 0:
+                        self._fps = (1.0 / dt) if self._fps == 0 else 0.9 * self._fps + 0.1 * (1.0 / dt)
+                self._last_grab = now
+                self._frame = frame
+                self._frame_time = now
+                self._frame_seq += 1
+                self.connected = True
+
+        self._release()
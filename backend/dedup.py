@@ -0,0 +1,128 @@
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+
+def dhash(image):
+    """64-bit difference hash of a BGR or grayscale image"""
+    # Shrinking first keeps the color conversion to a handful of pixels
+    tiny = cv2.resize(image, (9, 8), interpolation=cv2.INTER_AREA)
+    if tiny.ndim == 3:
+        tiny = cv2.cvtColor(tiny, cv2.COLOR_BGR2GRAY)
+    bits = (tiny[:, 1:] > tiny[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+class SnapshotIndex:
+    """Recent incident snapshot hashes per identity, searched by Hamming distance.
+
+    Each hash is stored under a key (a track or re-identified person), and a
+    snapshot is only compared with earlier snapshots of the same key: hashes of
+    different people can sit a few bits apart on a fixed camera. Entries expire
+    after window_seconds and the index never holds more than capacity hashes,
+    so a lookup is one vectorized XOR + popcount.
+    """
+
+    def __init__(self, max_distance=5, window_seconds=60.0, capacity=256):
+        self.max_distance = max_distance
+        self.window_seconds = window_seconds
+        self._entries = deque(maxlen=capacity)
+
+    def _expire(self, now):
+        while self._entries and now - self._entries[0][2] > self.window_seconds:
+            self._entries.popleft()
+
+    def nearest(self, key, h, now=None):
+        """Smallest Hamming distance from h to a live entry of key, or None if there is none"""
+        self._expire(time.monotonic() if now is None else now)
+        hashes = np.array([e[1] for e in self._entries if e[0] == key], dtype=np.uint64)
+        if not hashes.size:
+            return None
+        diff = np.bitwise_xor(hashes, np.uint64(h))
+        distances = np.unpackbits(diff.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+        return int(distances.min())
+
+    def is_duplicate(self, key, h, now=None):
+        distance = self.nearest(key, h, now)
+        return distance is not None and distance <= self.max_distance
+
+    def add(self, key, h, now=None):
+        self._entries.append((key, h, time.monotonic() if now is None else now))
+
+
+def _crop(frame, box):
+    if box is None:
+        return frame
+    sx, sy, ex, ey = box
+    crop = frame[max(sy, 0):ey, max(sx, 0):ex]
+    return crop if crop.size else frame
+
+
+class IncidentTrigger:
+    """Decides which new tracks and zone alerts deserve an incident snapshot.
+
+    A track triggers once, the first time it is seen with motion, unless its
+    box looks like a recent snapshot of the same identity. That identity is the
+    re-identified person when there is one; otherwise it is where the track sits
+    in the frame (a coarse grid cell and its neighbours), since tracker IDs never
+    recur but a loitering person whose track is dropped and re-created does.
+    """
+
+    def __init__(self, index=None, grid=8):
+        self.index = index if index is not None else SnapshotIndex()
+        self.grid = grid
+        self.reported = set()
+
+    def identity_keys(self, camera_id, centroid, frame_shape, person_id=None):
+        """Keys to compare against; the first is the one a new snapshot is stored under"""
+        if person_id is not None:
+            return [("person", person_id)]
+        height, width = frame_shape[:2]
+        cx = min(max(int(centroid[0] * self.grid / width), 0), self.grid - 1)
+        cy = min(max(int(centroid[1] * self.grid / height), 0), self.grid - 1)
+        # Neighbouring cells too, so jitter across a cell border still matches
+        offsets = [(0, 0)] + [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy]
+        return [("cell", camera_id, cx + dx, cy + dy) for dx, dy in offsets]
+
+    def _is_new(self, keys, frame, box, now):
+        snapshot_hash = dhash(_crop(frame, box))
+        if any(self.index.is_duplicate(key, snapshot_hash, now) for key in keys):
+            return False
+        self.index.add(keys[0], snapshot_hash, now)
+        return True
+
+    def _box(self, boxes, centroid):
+        return boxes.get((int(centroid[0]), int(centroid[1]))) if centroid is not None else None
+
+    def new_tracks(self, camera_id, frame, objects, boxes, track_persons, motion, now=None):
+        """Return the new track IDs that warrant an incident, marking every new track as reported"""
+        tracked = set(objects.keys())
+        self.reported &= tracked
+        new_ids = tracked - self.reported
+        if not motion or not new_ids:
+            return []
+        fresh = [i for i in sorted(new_ids)
+                 if self._is_new(self.identity_keys(camera_id, objects[i], frame.shape, track_persons.get(i)),
+                                 frame, self._box(boxes, objects[i]), now)]
+        # Skipped tracks matched a recent snapshot of their own identity, so they are covered
+        self.reported |= new_ids
+        return fresh
+
+    def zone_alerts(self, camera_id, frame, events, objects, boxes, track_persons, now=None):
+        """Return the alerting zone events that aren't a repeat of the same identity's recent alert"""
+        fresh = []
+        for event in events:
+            if not event["alert"]:
+                continue
+            object_id = event["object_id"]
+            centroid = objects.get(object_id)
+            if centroid is not None:
+                identities = self.identity_keys(camera_id, centroid, frame.shape, track_persons.get(object_id))
+            else:
+                identities = [("track", camera_id, object_id)]  # Dropped track leaving a zone
+            keys = [(identity, event["type"], event["name"]) for identity in identities]
+            if self._is_new(keys, frame, self._box(boxes, centroid), now):
+                fresh.append(event)
+        return fresh
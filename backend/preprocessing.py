@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+
+
+class FramePreprocessor:
+    """Per-camera preprocessing stage.
+
+    Computes the downscaled frame and its grayscale / RGB views once per frame
+    into preallocated buffers that MOG2, HOG and the face detector share.
+    Buffers are only reallocated when the source resolution changes.
+    """
+
+    def __init__(self, target_width=640, need_gray=True, need_rgb=True):
+        self.target_width = target_width
+        self.need_gray = need_gray
+        self.need_rgb = need_rgb
+
+        self.scale = 1.0
+        self.small = None
+        self.gray = None
+        self.rgb = None
+        self.fg_mask = None
+        self.dilated = None
+
+        self._src_shape = None
+        self._small_buf = None
+
+    def _allocate(self, shape):
+        height, width = shape[:2]
+        if width > self.target_width:
+            small_h, small_w = int(height * (self.target_width / width)), self.target_width
+            self._small_buf = np.empty((small_h, small_w, 3), np.uint8)
+        else:
+            small_h, small_w = height, width
+            self._small_buf = None
+        self.scale = width / small_w
+
+        self.gray = np.empty((small_h, small_w), np.uint8) if self.need_gray else None
+        self.rgb = np.empty((small_h, small_w, 3), np.uint8) if self.need_rgb else None
+        self.fg_mask = np.empty((small_h, small_w), np.uint8)
+        self.dilated = np.empty((small_h, small_w), np.uint8)
+        self._src_shape = shape
+
+    def process(self, frame):
+        """Fill the shared buffers from a BGR frame and return the downscaled view"""
+        if frame.shape != self._src_shape:
+            self._allocate(frame.shape)
+
+        if self._small_buf is not None:
+            small_h, small_w = self._small_buf.shape[:2]
+            cv2.resize(frame, (small_w, small_h), dst=self._small_buf)
+            self.small = self._small_buf
+        else:
+            self.small = frame
+
+        if self.need_gray:
+            cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if self.need_rgb:
+            cv2.cvtColor(self.small, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        return self.small
+
+    def foreground_mask(self, fgbg):
+        """Run background subtraction on the current small frame into the mask buffers"""
+        fgbg.apply(self.small, self.fg_mask)
+        cv2.threshold(self.fg_mask, 250, 255, cv2.THRESH_BINARY, dst=self.fg_mask)  # Remove shadows
+        cv2.dilate(self.fg_mask, None, dst=self.dilated, iterations=2)
+        return self.dilated
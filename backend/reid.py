@@ -0,0 +1,167 @@
+import time
+
+import cv2
+import numpy as np
+
+HIST_BINS = [16, 8]  # hue, saturation
+DESCRIPTOR_DIM = HIST_BINS[0] * HIST_BINS[1]
+
+
+def appearance_descriptor(frame, box, min_size=8):
+    """L2-normalized HSV histogram of a BGR crop, or None if the crop is too small"""
+    height, width = frame.shape[:2]
+    sx, sy, ex, ey = box
+    sx, sy = max(sx, 0), max(sy, 0)
+    ex, ey = min(ex, width), min(ey, height)
+    if ex - sx < min_size or ey - sy < min_size:
+        return None
+    hsv = cv2.cvtColor(frame[sy:ey, sx:ex], cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, HIST_BINS, [0, 180, 0, 256]).ravel()
+    norm = np.linalg.norm(hist)
+    return hist / norm if norm > 0 else None
+
+
+class ReIDIndex:
+    """Appearance index that maps track descriptors to stable person IDs.
+
+    One row per known person in a fixed-size float32 matrix. A batch of
+    descriptors is matched with a single matrix product (cosine similarity,
+    since rows are unit length) and greedy one-to-one assignment. Rows not
+    seen for ttl_seconds are evicted; when the matrix is full the least
+    recently seen row is reused.
+    """
+
+    def __init__(self, capacity=1024, threshold=0.9, ttl_seconds=1800.0, momentum=0.8):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.momentum = momentum
+        self.vectors = np.zeros((capacity, DESCRIPTOR_DIM), np.float32)
+        self.person_ids = np.full(capacity, -1, np.int64)
+        self.last_seen = np.zeros(capacity, np.float64)
+        self.next_person_id = 0
+
+    @property
+    def unique_count(self):
+        return self.next_person_id
+
+    def _evict(self, now):
+        expired = (self.person_ids >= 0) & (now - self.last_seen > self.ttl_seconds)
+        self.person_ids[expired] = -1
+
+    def _free_slot(self):
+        free = np.flatnonzero(self.person_ids < 0)
+        return int(free[0]) if free.size else int(np.argmin(self.last_seen))
+
+    def touch(self, person_ids, now=None):
+        """Keep people that are still being tracked from expiring"""
+        if person_ids:
+            now = time.monotonic() if now is None else now
+            self.last_seen[np.isin(self.person_ids, list(person_ids))] = now
+
+    def match(self, descriptors, exclude=(), now=None):
+        """Return a person ID for each descriptor, registering new people as needed"""
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+        queries = np.asarray(descriptors, dtype=np.float32).reshape(-1, DESCRIPTOR_DIM)
+
+        # People currently on another track can't be this one too
+        candidates = self.person_ids >= 0
+        if exclude:
+            candidates &= ~np.isin(self.person_ids, list(exclude))
+
+        sims = queries @ self.vectors.T
+        sims[:, ~candidates] = -1.0
+
+        assigned = [None] * len(queries)
+        while sims.size:
+            qi, row = np.unravel_index(np.argmax(sims), sims.shape)
+            if sims[qi, row] < self.threshold:
+                break
+            assigned[qi] = int(self.person_ids[row])
+            blended = self.momentum * self.vectors[row] + (1 - self.momentum) * queries[qi]
+            self.vectors[row] = blended / max(np.linalg.norm(blended), 1e-6)
+            self.last_seen[row] = now
+            sims[qi, :] = -1.0
+            sims[:, row] = -1.0
+
+        for qi, person_id in enumerate(assigned):
+            if person_id is None:
+                row = self._free_slot()
+                self.vectors[row] = queries[qi]
+                self.person_ids[row] = self.next_person_id
+                self.last_seen[row] = now
+                assigned[qi] = self.next_person_id
+                self.next_person_id += 1
+        return assigned
+
+
+def boxes_by_center(rects):
+    """The tracker stores the integer center of the matched rect, so centers find the box again"""
+    return {(int((sx + ex) / 2.0), int((sy + ey) / 2.0)): (sx, sy, ex, ey) for (sx, sy, ex, ey) in rects}
+
+
+class TrackIdentifier:
+    """Maps each camera's tracker IDs to re-identified person IDs.
+
+    Only tracks matched to a person box are described; a track keeps its
+    person ID for as long as the tracker keeps it. Face-only tracks have no
+    box to describe, so each track that never gets a person ID is counted
+    once as its own visitor in unique_count instead of being left out.
+    """
+
+    def __init__(self, index=None):
+        self.index = index if index is not None else ReIDIndex()
+        self.track_persons = {}
+        self._tracks = {}
+        self._unmatched = 0
+
+    @property
+    def unique_count(self):
+        live = sum(len(tracks.difference(self.track_persons.get(camera_id, {})))
+                   for camera_id, tracks in self._tracks.items())
+        return self.index.unique_count + self._unmatched + live
+
+    def _prune(self, camera_id, objects):
+        known = self.track_persons.setdefault(camera_id, {})
+        tracks = self._tracks.setdefault(camera_id, set())
+        for object_id in tracks.difference(objects):
+            if object_id not in known:
+                self._unmatched += 1
+            known.pop(object_id, None)
+        tracks.clear()
+        tracks.update(objects)
+        return known
+
+    def clear(self):
+        """Forget the current tracks, still counting the ones that never got a person ID"""
+        for camera_id in list(self._tracks):
+            self._prune(camera_id, {})
+        self.track_persons.clear()
+        self._tracks.clear()
+
+    def identify(self, camera_id, objects, person_rects, frame, scale=1.0, now=None):
+        """Return {track_id: person_id} for the camera, describing only person tracks that don't have one yet.
+
+        person_rects are in full-frame coordinates; frame may be a downscaled
+        view, with scale the full-frame width over its width.
+        """
+        known = self._prune(camera_id, objects)
+        boxes = boxes_by_center(person_rects)
+        pending, descriptors = [], []
+        for object_id, centroid in objects.items():
+            if object_id in known:
+                continue
+            box = boxes.get((int(centroid[0]), int(centroid[1])))
+            if box is None:
+                continue  # A face track, or not detected this frame
+            desc = appearance_descriptor(frame, tuple(int(v / scale) for v in box))
+            if desc is not None:
+                pending.append(object_id)
+                descriptors.append(desc)
+
+        active = {pid for tracks in self.track_persons.values() for pid in tracks.values()}
+        self.index.touch(active, now)
+        if descriptors:
+            for object_id, person_id in zip(pending, self.index.match(descriptors, exclude=active, now=now)):
+                known[object_id] = person_id
+        return known
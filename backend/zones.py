@@ -0,0 +1,172 @@
+import time
+
+import cv2
+import numpy as np
+
+
+def _check_point(point, what):
+    if (not isinstance(point, (list, tuple)) or len(point) != 2
+            or not all(isinstance(v, (int, float)) and not isinstance(v, bool) and 0.0 <= v <= 1.0 for v in point)):
+        raise ValueError(f"{what} must be an (x, y) pair of numbers in [0, 1], got {point!r}")
+
+
+def _check_unique(items, kind):
+    names = [item["name"] for item in items]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate {kind} names: {', '.join(duplicates)}")
+
+
+class ZoneEngine:
+    """Zone occupancy and line-crossing counts for one camera.
+
+    Zones are polygons and lines are tripwires, both given in normalized
+    (0-1) frame coordinates. Zones are rasterized once per frame size into a
+    label mask so each tracked centroid is classified with a single lookup;
+    where zones overlap the one listed last wins. Tripwires are tested
+    against every track's last movement segment in one vectorized pass.
+    Line directions are relative to the start -> end orientation: "in" means
+    the track crossed from the left side to the right side of that vector.
+    """
+
+    def __init__(self, zones=None, lines=None):
+        self.zones = list(zones or [])
+        self.lines = list(lines or [])
+        if len(self.zones) > 255:
+            raise ValueError("At most 255 zones per camera are supported")
+        _check_unique(self.zones, "zone")
+        _check_unique(self.lines, "line")
+        for zone in self.zones:
+            if len(zone["points"]) < 3:
+                raise ValueError(f"Zone '{zone['name']}' needs at least 3 points")
+            for point in zone["points"]:
+                _check_point(point, f"Zone '{zone['name']}' point")
+        for line in self.lines:
+            _check_point(line["start"], f"Line '{line['name']}' start")
+            _check_point(line["end"], f"Line '{line['name']}' end")
+
+        # Rasterize once up front so bad geometry fails when the config is set, not mid-stream
+        self._mask = None
+        self._mask_shape = None
+        self._rasterize((64, 64))
+        self._lines_norm = np.array([list(line["start"]) + list(line["end"]) for line in self.lines], dtype=np.float64).reshape(-1, 4)
+
+        self._prev = {}
+        self._label = {}
+        self._entered_at = {}
+        self._dwell_fired = set()
+
+        self.zone_counts = {z["name"]: {"occupancy": 0, "entered": 0, "exited": 0} for z in self.zones}
+        self.line_counts = {l["name"]: {"in": 0, "out": 0} for l in self.lines}
+
+    def config(self):
+        return {"zones": self.zones, "lines": self.lines}
+
+    def _rasterize(self, shape):
+        height, width = shape[:2]
+        mask = np.zeros((height, width), np.uint8)
+        for label, zone in enumerate(self.zones, start=1):
+            pts = np.array(zone["points"], dtype=np.float64) * (width, height)
+            cv2.fillPoly(mask, [pts.round().astype(np.int32)], label)
+        self._mask = mask
+        self._mask_shape = shape[:2]
+
+    def _event(self, kind, name, object_id, alert, **extra):
+        event = {"type": kind, "name": name, "object_id": int(object_id), "alert": alert}
+        event.update(extra)
+        return event
+
+    def update(self, objects, frame_shape, now=None):
+        """Classify the tracker's current centroids and return enter/exit/dwell/cross events"""
+        now = time.monotonic() if now is None else now
+        if self._mask_shape != frame_shape[:2]:
+            self._rasterize(frame_shape)
+        height, width = self._mask_shape
+        events = []
+
+        id_list = list(objects.keys())
+        ids = np.array(id_list, dtype=np.int64)
+        curr = np.array([objects[i] for i in id_list], dtype=np.float64).reshape(-1, 2)
+
+        # Zone membership: one mask lookup per centroid
+        if self.zones and len(ids):
+            xs = np.clip(curr[:, 0].astype(np.int64), 0, width - 1)
+            ys = np.clip(curr[:, 1].astype(np.int64), 0, height - 1)
+            labels = self._mask[ys, xs]
+        else:
+            labels = np.zeros(len(ids), np.uint8)
+
+        for object_id, label in zip(id_list, labels.tolist()):
+            prev_label = self._label.get(object_id, 0)
+            if label != prev_label:
+                if prev_label:
+                    events.append(self._exit(object_id, prev_label))
+                if label:
+                    zone = self.zones[label - 1]
+                    self.zone_counts[zone["name"]]["entered"] += 1
+                    self._entered_at[object_id] = now
+                    events.append(self._event("enter", zone["name"], object_id, zone.get("alert", False)))
+                self._label[object_id] = label
+            elif label and object_id not in self._dwell_fired:
+                zone = self.zones[label - 1]
+                dwell = zone.get("dwell_seconds")
+                if dwell and now - self._entered_at[object_id] >= dwell:
+                    self._dwell_fired.add(object_id)
+                    events.append(self._event("dwell", zone["name"], object_id, zone.get("alert", False),
+                                              seconds=round(now - self._entered_at[object_id], 1)))
+
+        # Tracks the tracker has dropped leave whatever zone they were in
+        active = set(id_list)
+        for object_id in [i for i in self._prev if i not in active]:
+            label = self._label.pop(object_id, 0)
+            if label:
+                events.append(self._exit(object_id, label))
+            del self._prev[object_id]
+
+        # Tripwires: segment intersection of every line with every track's last step
+        has_prev = np.array([i in self._prev for i in id_list], dtype=bool)
+        if self.lines and has_prev.any():
+            moved_ids = ids[has_prev]
+            q = curr[has_prev]
+            p = np.array([self._prev[i] for i in moved_ids.tolist()], dtype=np.float64)
+            a = self._lines_norm[:, None, 0:2] * (width, height)
+            b = self._lines_norm[:, None, 2:4] * (width, height)
+            ab = b - a
+            d1 = ab[..., 0] * (p[None, :, 1] - a[..., 1]) - ab[..., 1] * (p[None, :, 0] - a[..., 0])
+            d2 = ab[..., 0] * (q[None, :, 1] - a[..., 1]) - ab[..., 1] * (q[None, :, 0] - a[..., 0])
+            pq = (q - p)[None, :, :]
+            d3 = pq[..., 0] * (a[..., 1] - p[None, :, 1]) - pq[..., 1] * (a[..., 0] - p[None, :, 0])
+            d4 = pq[..., 0] * (b[..., 1] - p[None, :, 1]) - pq[..., 1] * (b[..., 0] - p[None, :, 0])
+            crossed = (d1 * d2 < 0) & (d3 * d4 < 0)
+            for li, ti in zip(*np.nonzero(crossed)):
+                line = self.lines[li]
+                # Image y grows downward, so a positive cross product is the right-hand side
+                direction = "in" if d2[li, ti] > 0 else "out"
+                self.line_counts[line["name"]][direction] += 1
+                events.append(self._event("cross", line["name"], moved_ids[ti], line.get("alert", False), direction=direction))
+
+        for object_id, pt in zip(id_list, curr.tolist()):
+            self._prev[object_id] = pt
+
+        occupancy = np.bincount(labels, minlength=len(self.zones) + 1) if len(labels) else np.zeros(len(self.zones) + 1, np.int64)
+        for label, zone in enumerate(self.zones, start=1):
+            self.zone_counts[zone["name"]]["occupancy"] = int(occupancy[label])
+        return events
+
+    def _exit(self, object_id, label):
+        zone = self.zones[label - 1]
+        self.zone_counts[zone["name"]]["exited"] += 1
+        self._entered_at.pop(object_id, None)
+        self._dwell_fired.discard(object_id)
+        return self._event("exit", zone["name"], object_id, zone.get("alert", False))
+
+    def draw(self, frame):
+        """Outline zones and tripwires on the frame"""
+        height, width = frame.shape[:2]
+        for zone in self.zones:
+            pts = (np.array(zone["points"], dtype=np.float64) * (width, height)).round().astype(np.int32)
+            cv2.polylines(frame, [pts], True, (0, 255, 255), 2)
+            cv2.putText(frame, zone["name"], tuple(int(v) for v in pts[0]), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1)
+        for line, (x1, y1, x2, y2) in zip(self.lines, self._lines_norm * (width, height, width, height)):
+            cv2.line(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 255), 2)
+            cv2.putText(frame, line["name"], (int(x1), int(y1)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 255), 1)
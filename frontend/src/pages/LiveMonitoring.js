@@ -23,7 +23,7 @@ export default function LiveMonitoring() {
   const [error, setError] = useState(null);
 
   // New state for advanced features
-  const [uniquePeople, setUniquePeople] = useState(new Set());
+  const [uniqueVisitors, setUniqueVisitors] = useState(0);
   const [movementDirection, setMovementDirection] = useState('Standing');
   const [activityLevel, setActivityLevel] = useState(0);
   const [totalDetections, setTotalDetections] = useState(0);
@@ -93,13 +93,9 @@ export default function LiveMonitoring() {
           setRecording(data.recording || false);
           setConnected(true);
 
-          // Track unique people (Real)
-          if (data.active_object_ids && Array.isArray(data.active_object_ids)) {
-            setUniquePeople(prev => {
-              const newSet = new Set(prev);
-              data.active_object_ids.forEach(id => newSet.add(id));
-              return newSet;
-            });
+          // Unique people (re-identified on the backend; face-only tracks count once each)
+          if (typeof data.unique_visitors === 'number') {
+            setUniqueVisitors(data.unique_visitors);
           }
 
           if (currentCount > 0) {
@@ -334,7 +330,7 @@ export default function LiveMonitoring() {
                 </div>
                 <div className="flex justify-between">
                   <span className="text-muted-foreground">Unique People</span>
-                  <span className="font-bold text-lg text-blue-500">{uniquePeople.size}</span>
+                  <span className="font-bold text-lg text-blue-500">{uniqueVisitors}</span>
                 </div>
                 <div className="flex justify-between">
                   <span className="text-muted-foreground">Faces</span>
@@ -0,0 +1,83 @@
+import asyncio
+
+import aiosqlite
+
+from analytics import OccupancyAggregator, init_analytics_db, query_occupancy
+
+# Minute-aligned; this minute and the next share one hour and one day bucket
+BASE = 1_700_000_040
+NO_DIRECTIONS = {"Standing": 0}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def make_db(path):
+    async with aiosqlite.connect(path) as db:
+        await init_analytics_db(db)
+        await db.commit()
+    return path
+
+
+def test_bucket_closes_on_minute_rollover():
+    agg = OccupancyAggregator(":memory:", batch_size=1)
+    agg.record("cam", 1, True, [0], NO_DIRECTIONS, ts=BASE)
+    agg.record("cam", 3, False, [0, 1], NO_DIRECTIONS, ts=BASE + 59)
+    assert not agg.should_flush()
+
+    agg.record("cam", 2, False, [1], NO_DIRECTIONS, ts=BASE + 60)
+    assert agg.should_flush()
+
+
+def test_flush_writes_minutes_and_merges_hour_and_day(tmp_path):
+    db_path = run(make_db(tmp_path / "analytics.db"))
+    agg = OccupancyAggregator(db_path)
+    agg.record("cam", 1, True, [0], {"Standing": 1}, ts=BASE)
+    agg.record("cam", 3, False, [0, 1, 2], {"Standing": 1, "Moving Left": 2}, ts=BASE + 10)
+    agg.record("cam", 2, True, [2, 3], {"Moving Right": 2}, ts=BASE + 60)
+    assert run(agg.flush(close_open=True)) == 2
+
+    minutes = run(query_occupancy(db_path, BASE, BASE + 120, "minute"))
+    assert [b["samples"] for b in minutes] == [2, 1]
+    assert minutes[0]["min_count"] == 1 and minutes[0]["max_count"] == 3
+    assert minutes[0]["avg_count"] == 2.0
+    assert minutes[0]["motion_ratio"] == 0.5
+    assert minutes[0]["new_tracks"] == 3
+    assert minutes[1]["new_tracks"] == 1
+
+    for resolution in ("hour", "day"):
+        (bucket,) = run(query_occupancy(db_path, BASE, BASE + 120, resolution))
+        assert bucket["samples"] == 3
+        assert bucket["min_count"] == 1 and bucket["max_count"] == 3
+        assert bucket["avg_count"] == 2.0
+        assert bucket["new_tracks"] == 4
+        assert bucket["direction_counts"]["Standing"] == 2
+        assert bucket["direction_counts"]["Moving Left"] == 2
+        assert bucket["direction_counts"]["Moving Right"] == 2
+
+
+def test_later_flush_of_same_minute_adds_to_existing_rows(tmp_path):
+    db_path = run(make_db(tmp_path / "analytics.db"))
+    agg = OccupancyAggregator(db_path)
+    agg.record("cam", 4, False, [], NO_DIRECTIONS, ts=BASE)
+    run(agg.flush(close_open=True))
+    agg.record("cam", 0, False, [], NO_DIRECTIONS, ts=BASE + 30)
+    run(agg.flush(close_open=True))
+
+    (minute,) = run(query_occupancy(db_path, BASE, BASE + 60, "minute"))
+    assert minute["samples"] == 2
+    assert minute["min_count"] == 0 and minute["max_count"] == 4
+    (hour,) = run(query_occupancy(db_path, BASE, BASE + 60, "hour"))
+    assert hour["samples"] == 2
+
+
+def test_query_filters_by_camera(tmp_path):
+    db_path = run(make_db(tmp_path / "analytics.db"))
+    agg = OccupancyAggregator(db_path)
+    agg.record("a", 1, False, [], NO_DIRECTIONS, ts=BASE)
+    agg.record("b", 5, False, [], NO_DIRECTIONS, ts=BASE)
+    run(agg.flush(close_open=True))
+
+    buckets = run(query_occupancy(db_path, BASE, BASE + 60, "minute", camera_id="b"))
+    assert [(b["camera_id"], b["max_count"]) for b in buckets] == [("b", 5)]
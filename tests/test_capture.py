@@ -0,0 +1,120 @@
+import numpy as np
+import pytest
+
+import capture
+from capture import CaptureSource
+
+FRAME = np.zeros((4, 4, 3), np.uint8)
+
+
+class FakeStop:
+    """Stands in for the thread's stop Event so _run can be driven synchronously"""
+
+    def __init__(self):
+        self.flag = False
+        self.waits = []
+
+    def is_set(self):
+        return self.flag
+
+    def set(self):
+        self.flag = True
+
+    def clear(self):
+        self.flag = False
+
+    def wait(self, timeout):
+        self.waits.append(timeout)
+        return self.flag
+
+
+class FakeCapture:
+    """Each open of the device plays one scripted session: None can't open, else a list of read results"""
+
+    def __init__(self, world, reads):
+        self.world = world
+        self.reads = None if reads is None else list(reads)
+
+    def isOpened(self):
+        return self.reads is not None
+
+    def set(self, prop, value):
+        return True
+
+    def release(self):
+        pass
+
+    def read(self):
+        if self.reads:
+            return (True, FRAME) if self.reads.pop(0) else (False, None)
+        # Script exhausted: keep failing, and stop once no session is left
+        if not self.world["sessions"]:
+            self.world["stop"].set()
+        return False, None
+
+
+def run_source(monkeypatch, sessions, **kwargs):
+    source = CaptureSource("fake", **kwargs)
+    source._stop = FakeStop()
+    world = {"sessions": list(sessions), "stop": source._stop, "opens": 0}
+
+    def video_capture(_):
+        world["opens"] += 1
+        if not world["sessions"]:
+            world["stop"].set()
+            return FakeCapture(world, None)
+        return FakeCapture(world, world["sessions"].pop(0))
+
+    monkeypatch.setattr(capture.cv2, "VideoCapture", video_capture)
+    source._run()
+    return source, world
+
+
+def test_unavailable_source_backs_off_exponentially(monkeypatch):
+    source, world = run_source(monkeypatch, [None, None, None, None, [True]],
+                               min_backoff=0.5, max_backoff=2.0)
+    assert source._stop.waits == [0.5, 1.0, 2.0, 2.0]
+    assert source.read()[2] == 1
+
+
+def test_drop_after_max_failures_then_reopen(monkeypatch):
+    source, world = run_source(monkeypatch, [[False, False, False], [True]],
+                               min_backoff=0.5, max_failures=3)
+    assert world["opens"] == 2
+    assert source._stop.waits == [0.5]
+    assert source.read()[2] == 1
+
+
+def test_source_that_opens_but_never_delivers_still_backs_off(monkeypatch):
+    source, world = run_source(monkeypatch, [[False] * 3, [False] * 3, [False] * 3, [True]],
+                               min_backoff=0.5, max_backoff=10.0, max_failures=3)
+    assert source._stop.waits == [0.5, 1.0, 2.0]
+
+
+def test_backoff_resets_only_after_a_delivered_frame(monkeypatch):
+    sessions = [[False] * 3, [False] * 3, [True, False, False, False], [True]]
+    source, world = run_source(monkeypatch, sessions, min_backoff=0.5, max_failures=3)
+    # The third session opens with backoff still at 2.0; its frame resets it to 0.5
+    assert source._stop.waits == [0.5, 1.0, 0.5]
+    # Only reopens after a frame was ever delivered count as reconnects
+    assert source.reconnects == 1
+    assert source.read()[2] == 2
+
+
+def test_drop_clears_frame_and_fps(monkeypatch):
+    source, world = run_source(monkeypatch, [[True, True, True, False, False]], max_failures=2)
+    frame, _, seq = source.read()
+    assert frame is None and seq == 3
+    stats = source.stats()
+    assert stats["connected"] is False
+    assert stats["capture_fps"] == 0
+    assert stats["frame_age_ms"] is None
+
+
+@pytest.mark.parametrize("reads", [[True], [True, True]])
+def test_delivered_frames_are_published(monkeypatch, reads):
+    source, world = run_source(monkeypatch, [reads])
+    frame, capture_time, seq = source.read()
+    assert frame is FRAME
+    assert seq == len(reads)
+    assert capture_time > 0
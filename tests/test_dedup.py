@@ -0,0 +1,144 @@
+import numpy as np
+
+from dedup import IncidentTrigger, SnapshotIndex, dhash
+
+
+def gradient(increasing=True, offset=0):
+    """A 3-channel crop whose brightness rises (or falls) left to right"""
+    row = np.linspace(20, 200, 90) if increasing else np.linspace(200, 20, 90)
+    gray = np.tile(row + offset, (80, 1)).astype(np.uint8)
+    return np.dstack([gray, gray, gray])
+
+
+def test_dhash_ignores_brightness_shift():
+    assert dhash(gradient()) == dhash(gradient(offset=10))
+    assert dhash(gradient()) != dhash(gradient(increasing=False))
+
+
+def test_same_person_repeat_is_duplicate():
+    index = SnapshotIndex(max_distance=5, window_seconds=60.0)
+    index.add(("person", 1), dhash(gradient()), now=0.0)
+    assert index.is_duplicate(("person", 1), dhash(gradient(offset=10)), now=10.0)
+
+
+def test_distinct_person_is_not_duplicate():
+    index = SnapshotIndex(max_distance=5, window_seconds=60.0)
+    index.add(("person", 1), dhash(gradient()), now=0.0)
+    assert not index.is_duplicate(("person", 1), dhash(gradient(increasing=False)), now=10.0)
+
+
+def test_identical_hash_under_another_key_is_not_duplicate():
+    # A second person must never be suppressed by the first one's snapshot
+    index = SnapshotIndex(max_distance=5, window_seconds=60.0)
+    h = dhash(gradient())
+    index.add(("track", "0", 1), h, now=0.0)
+    assert not index.is_duplicate(("track", "0", 2), h, now=10.0)
+    assert index.nearest(("track", "0", 2), h, now=10.0) is None
+
+
+def test_entries_expire_after_window():
+    index = SnapshotIndex(max_distance=5, window_seconds=60.0)
+    h = dhash(gradient())
+    index.add(("person", 1), h, now=0.0)
+    assert index.is_duplicate(("person", 1), h, now=59.0)
+    assert not index.is_duplicate(("person", 1), h, now=61.0)
+
+
+def scene(*regions):
+    """160x160 frame with (box, increasing) gradient regions painted in"""
+    frame = np.zeros((160, 160, 3), np.uint8)
+    for (sx, sy, ex, ey), increasing in regions:
+        row = np.linspace(20, 200, ex - sx) if increasing else np.linspace(200, 20, ex - sx)
+        frame[sy:ey, sx:ex] = np.tile(row, (ey - sy, 1)).astype(np.uint8)[:, :, None]
+    return frame
+
+
+def center(box):
+    return (int((box[0] + box[2]) / 2.0), int((box[1] + box[3]) / 2.0))
+
+
+def track(*boxes):
+    """objects / boxes dicts for tracks 1..n, the way the tracker and boxes_by_center produce them"""
+    return {i: center(b) for i, b in boxes}, {center(b): b for _, b in boxes}
+
+
+LEFT = (20, 20, 120, 120)
+BOX = (40, 40, 80, 100)
+NEAR_BOX = (42, 40, 82, 100)
+RIGHT_BOX = (100, 40, 140, 100)
+
+
+def trigger():
+    return IncidentTrigger(SnapshotIndex(max_distance=5, window_seconds=60.0))
+
+
+def test_new_track_triggers_once():
+    t = trigger()
+    frame = scene((LEFT, True))
+    objects, boxes = track((1, BOX))
+    assert t.new_tracks("0", frame, objects, boxes, {}, motion=True, now=0.0) == [1]
+    assert t.new_tracks("0", frame, objects, boxes, {}, motion=True, now=1.0) == []
+
+
+def test_new_track_waits_for_motion():
+    t = trigger()
+    frame = scene((LEFT, True))
+    objects, boxes = track((1, BOX))
+    assert t.new_tracks("0", frame, objects, boxes, {}, motion=False, now=0.0) == []
+    assert t.new_tracks("0", frame, objects, boxes, {}, motion=True, now=1.0) == [1]
+
+
+def test_loitering_unidentified_person_on_a_new_track_is_suppressed():
+    t = trigger()
+    frame = scene((LEFT, True))
+    objects, boxes = track((1, BOX))
+    assert t.new_tracks("0", frame, objects, boxes, {}, motion=True, now=0.0) == [1]
+    assert t.new_tracks("0", frame, {}, {}, {}, motion=True, now=1.0) == []
+
+    # The tracker dropped the face track and re-created it a couple of pixels away
+    objects, boxes = track((2, NEAR_BOX))
+    assert t.new_tracks("0", frame, objects, boxes, {}, motion=True, now=2.0) == []
+
+
+def test_different_person_at_the_same_spot_triggers():
+    t = trigger()
+    objects, boxes = track((1, BOX))
+    assert t.new_tracks("0", scene((LEFT, True)), objects, boxes, {}, motion=True, now=0.0) == [1]
+    t.new_tracks("0", scene(), {}, {}, {}, motion=True, now=1.0)
+
+    objects, boxes = track((2, BOX))
+    assert t.new_tracks("0", scene((LEFT, False)), objects, boxes, {}, motion=True, now=10.0) == [2]
+
+
+def test_second_person_arriving_while_first_is_present_triggers():
+    t = trigger()
+    frame = scene((BOX, True), (RIGHT_BOX, False))
+    objects, boxes = track((1, BOX))
+    assert t.new_tracks("0", frame, objects, boxes, {}, motion=True, now=0.0) == [1]
+
+    objects, boxes = track((1, BOX), (2, RIGHT_BOX))
+    assert t.new_tracks("0", frame, objects, boxes, {}, motion=True, now=10.0) == [2]
+
+
+def test_reidentified_person_is_suppressed_anywhere_in_frame():
+    t = trigger()
+    objects, boxes = track((1, BOX))
+    assert t.new_tracks("0", scene((BOX, True)), objects, boxes, {1: 7}, motion=True, now=0.0) == [1]
+    t.new_tracks("0", scene(), {}, {}, {}, motion=True, now=1.0)
+
+    objects, boxes = track((2, RIGHT_BOX))
+    assert t.new_tracks("0", scene((RIGHT_BOX, True)), objects, boxes, {2: 7}, motion=True, now=2.0) == []
+
+
+def test_repeated_zone_alert_is_suppressed():
+    t = trigger()
+    frame = scene((LEFT, True))
+    objects, boxes = track((1, BOX))
+
+    def event(kind="enter", name="door", alert=True):
+        return {"type": kind, "name": name, "object_id": 1, "alert": alert}
+
+    assert t.zone_alerts("0", frame, [event()], objects, boxes, {}, now=0.0) == [event()]
+    assert t.zone_alerts("0", frame, [event()], objects, boxes, {}, now=1.0) == []
+    assert t.zone_alerts("0", frame, [event(name="exit_door")], objects, boxes, {}, now=2.0) == [event(name="exit_door")]
+    assert t.zone_alerts("0", frame, [event(kind="dwell", alert=False)], objects, boxes, {}, now=3.0) == []
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+
+from bench_preprocess import legacy_step, make_frames
+from preprocessing import FramePreprocessor
+
+
+def new_mog2():
+    return cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=25, detectShadows=True)
+
+
+@pytest.mark.parametrize("width,height", [(1920, 1080), (640, 480), (320, 240)])
+def test_matches_legacy_path(width, height):
+    legacy_fgbg, fgbg = new_mog2(), new_mog2()
+    prep = FramePreprocessor(target_width=640)
+    for frame in make_frames(5, width, height):
+        small, gray, rgb, dilated = legacy_step(legacy_fgbg, frame)
+
+        assert np.array_equal(prep.process(frame), small)
+        assert np.array_equal(prep.gray, gray)
+        assert np.array_equal(prep.rgb, rgb)
+        assert np.array_equal(prep.foreground_mask(fgbg), dilated)
+        assert prep.scale == width / small.shape[1]
+
+
+def test_buffers_are_reused_at_same_resolution():
+    prep = FramePreprocessor(target_width=640)
+    frames = make_frames(2, 1280, 720)
+    prep.process(frames[0])
+    buffers = (prep.small, prep.gray, prep.rgb, prep.fg_mask, prep.dilated)
+    prep.process(frames[1])
+    assert all(a is b for a, b in zip(buffers, (prep.small, prep.gray, prep.rgb, prep.fg_mask, prep.dilated)))
+
+
+def test_buffers_are_reallocated_when_resolution_changes():
+    prep = FramePreprocessor(target_width=640)
+    prep.process(make_frames(1, 1920, 1080)[0])
+    assert prep.small.shape == (360, 640, 3)
+    assert prep.gray.shape == prep.fg_mask.shape == (360, 640)
+    assert prep.scale == 3.0
+
+    frame = make_frames(1, 320, 240)[0]
+    assert prep.process(frame) is frame
+    assert prep.gray.shape == prep.fg_mask.shape == prep.dilated.shape == (240, 320)
+    assert prep.rgb.shape == (240, 320, 3)
+    assert prep.scale == 1.0
+
+
+def test_only_requested_views_are_built():
+    prep = FramePreprocessor(target_width=640, need_gray=False, need_rgb=True)
+    prep.process(make_frames(1, 800, 600)[0])
+    assert prep.gray is None
+    assert prep.rgb.shape == (480, 640, 3)
@@ -0,0 +1,137 @@
+import numpy as np
+
+from reid import DESCRIPTOR_DIM, ReIDIndex, TrackIdentifier, appearance_descriptor, boxes_by_center
+
+RED, GREEN, BLUE = (0, 0, 255), (0, 255, 0), (255, 0, 0)
+
+
+def describe(color):
+    frame = np.zeros((120, 120, 3), np.uint8)
+    frame[20:100, 40:80] = color
+    return appearance_descriptor(frame, (40, 20, 80, 100))
+
+
+def test_descriptor_is_unit_length_and_rejects_tiny_crops():
+    desc = describe(RED)
+    assert desc.shape == (DESCRIPTOR_DIM,)
+    assert np.isclose(np.linalg.norm(desc), 1.0)
+    assert appearance_descriptor(np.zeros((50, 50, 3), np.uint8), (10, 10, 14, 40)) is None
+
+
+def test_returning_person_gets_same_id():
+    index = ReIDIndex()
+    (first,) = index.match([describe(RED)], now=0.0)
+    (other,) = index.match([describe(BLUE)], now=1.0)
+    (again,) = index.match([describe(RED)], now=2.0)
+    assert again == first != other
+    assert index.unique_count == 2
+
+
+def test_batch_assignment_is_one_to_one():
+    index = ReIDIndex()
+    index.match([describe(RED)], now=0.0)
+    ids = index.match([describe(RED), describe(RED)], now=1.0)
+    assert len(set(ids)) == 2
+    assert index.unique_count == 2
+
+
+def test_active_person_is_excluded():
+    index = ReIDIndex()
+    (first,) = index.match([describe(RED)], now=0.0)
+    (second,) = index.match([describe(RED)], exclude={first}, now=1.0)
+    assert second != first
+
+
+def test_unseen_person_expires_after_ttl():
+    index = ReIDIndex(ttl_seconds=10.0)
+    (first,) = index.match([describe(RED)], now=0.0)
+    (later,) = index.match([describe(RED)], now=20.0)
+    assert later != first
+
+
+def test_touch_keeps_tracked_person_alive():
+    index = ReIDIndex(ttl_seconds=10.0)
+    (first,) = index.match([describe(RED)], now=0.0)
+    index.touch({first}, now=8.0)
+    (again,) = index.match([describe(RED)], now=15.0)
+    assert again == first
+
+
+def test_full_index_reuses_least_recently_seen_row():
+    index = ReIDIndex(capacity=2)
+    (red,) = index.match([describe(RED)], now=0.0)
+    index.match([describe(GREEN)], now=1.0)
+    index.match([describe(BLUE)], now=2.0)
+    (red_again,) = index.match([describe(RED)], now=3.0)
+    assert red_again != red
+    assert index.unique_count == 4
+
+
+def painted(*boxes):
+    """240x240 frame with each (box, color) filled in"""
+    frame = np.zeros((240, 240, 3), np.uint8)
+    for (sx, sy, ex, ey), color in boxes:
+        frame[sy:ey, sx:ex] = color
+    return frame
+
+
+LEFT, RIGHT = (20, 20, 60, 100), (140, 20, 180, 100)
+
+
+def test_boxes_are_found_by_tracker_centroid():
+    assert boxes_by_center([LEFT, RIGHT]) == {(40, 60): LEFT, (160, 60): RIGHT}
+    # Odd sizes truncate the same way the tracker does
+    assert boxes_by_center([(0, 0, 5, 5)]) == {(2, 2): (0, 0, 5, 5)}
+
+
+def test_person_tracks_are_matched_by_centroid_and_face_tracks_skipped():
+    ids = TrackIdentifier()
+    frame = painted((LEFT, RED), (RIGHT, BLUE))
+    # Track 2 is a face track: its centroid is not the center of any person box
+    known = ids.identify("0", {1: (40, 60), 2: (160, 40)}, [LEFT, RIGHT], frame, now=0.0)
+    assert set(known) == {1}
+    assert ids.index.unique_count == 1
+
+
+def test_person_ids_stick_to_their_track():
+    ids = TrackIdentifier()
+    first = dict(ids.identify("0", {1: (40, 60)}, [LEFT], painted((LEFT, RED)), now=0.0))
+    # Recolored but still the same track, so it is not described again
+    assert ids.identify("0", {1: (40, 60)}, [LEFT], painted((LEFT, BLUE)), now=1.0) == first
+    assert ids.index.unique_count == 1
+
+
+def test_boxes_are_scaled_to_the_downscaled_frame():
+    ids = TrackIdentifier()
+    small = painted(((10, 10, 30, 50), RED))
+    known = ids.identify("0", {1: (40, 60)}, [LEFT], small, scale=2.0, now=0.0)
+    (ref,) = ids.index.match([describe(RED)], now=1.0)
+    assert known == {1: ref}
+
+
+def test_person_active_on_another_camera_is_excluded():
+    ids = TrackIdentifier()
+    frame = painted((LEFT, RED))
+    a = ids.identify("a", {1: (40, 60)}, [LEFT], frame, now=0.0)
+    b = ids.identify("b", {1: (40, 60)}, [LEFT], frame, now=1.0)
+    assert a[1] != b[1]
+
+    # Once camera a loses its track the same look maps back to that person
+    ids.identify("a", {}, [], frame, now=2.0)
+    c = ids.identify("c", {5: (40, 60)}, [LEFT], frame, now=3.0)
+    assert c[5] == a[1]
+
+
+def test_face_only_tracks_still_count_as_visitors():
+    ids = TrackIdentifier()
+    frame = painted((LEFT, RED))
+    ids.identify("0", {1: (100, 200), 2: (200, 200)}, [], frame, now=0.0)
+    assert ids.unique_count == 2
+
+    # Ended face tracks stay counted, a track that gets a person ID is counted once
+    ids.identify("0", {3: (40, 60)}, [], frame, now=1.0)
+    assert ids.unique_count == 3
+    ids.identify("0", {3: (40, 60)}, [LEFT], frame, now=2.0)
+    assert ids.unique_count == 3
+    ids.clear()
+    assert ids.unique_count == 3
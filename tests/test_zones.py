@@ -0,0 +1,81 @@
+import pytest
+
+from zones import ZoneEngine
+
+SHAPE = (100, 100, 3)
+SQUARE = {"name": "door", "points": [[0.25, 0.25], [0.75, 0.25], [0.75, 0.75], [0.25, 0.75]], "dwell_seconds": 5}
+# Vertical tripwire pointing down the middle of the frame
+WIRE = {"name": "gate", "start": [0.5, 0.0], "end": [0.5, 1.0]}
+
+
+def kinds(events):
+    return [(e["type"], e["name"], e["object_id"]) for e in events]
+
+
+def test_enter_dwell_and_exit():
+    engine = ZoneEngine(zones=[SQUARE])
+    assert engine.update({1: (10, 50)}, SHAPE, now=0.0) == []
+
+    assert kinds(engine.update({1: (50, 50)}, SHAPE, now=1.0)) == [("enter", "door", 1)]
+    assert engine.zone_counts["door"] == {"occupancy": 1, "entered": 1, "exited": 0}
+
+    assert engine.update({1: (52, 50)}, SHAPE, now=5.0) == []
+    events = engine.update({1: (52, 52)}, SHAPE, now=6.0)
+    assert kinds(events) == [("dwell", "door", 1)]
+    assert events[0]["seconds"] == 5.0
+    # Dwell fires once per visit
+    assert engine.update({1: (52, 52)}, SHAPE, now=20.0) == []
+
+    assert kinds(engine.update({1: (90, 50)}, SHAPE, now=21.0)) == [("exit", "door", 1)]
+    assert engine.zone_counts["door"] == {"occupancy": 0, "entered": 1, "exited": 1}
+
+
+def test_dropped_track_exits_zone():
+    engine = ZoneEngine(zones=[SQUARE])
+    engine.update({7: (50, 50)}, SHAPE, now=0.0)
+    assert kinds(engine.update({}, SHAPE, now=1.0)) == [("exit", "door", 7)]
+    assert engine.zone_counts["door"]["occupancy"] == 0
+
+
+def test_line_crossing_direction():
+    engine = ZoneEngine(lines=[WIRE])
+    engine.update({1: (40, 50), 2: (60, 20)}, SHAPE)
+    events = engine.update({1: (60, 50), 2: (40, 30)}, SHAPE)
+
+    by_id = {e["object_id"]: e for e in events}
+    assert set(by_id) == {1, 2}
+    assert all(e["type"] == "cross" and e["name"] == "gate" for e in events)
+    # Walking along the wire (downward), the right-hand side is the left of the image
+    assert by_id[1]["direction"] == "out"
+    assert by_id[2]["direction"] == "in"
+    assert engine.line_counts["gate"] == {"in": 1, "out": 1}
+
+
+def test_no_crossing_without_history_or_when_staying_on_one_side():
+    engine = ZoneEngine(lines=[WIRE])
+    assert engine.update({1: (60, 50)}, SHAPE) == []
+    assert engine.update({1: (70, 50)}, SHAPE) == []
+    assert engine.line_counts["gate"] == {"in": 0, "out": 0}
+
+
+@pytest.mark.parametrize("points", [
+    [[0, 0, 0], [1, 0, 0], [1, 1, 0]],
+    [[0, 0], [1], [1, 1]],
+    [[0, 0], [1.5, 0], [1, 1]],
+    [[0, 0], [1, 0]],
+])
+def test_rejects_bad_zone_points(points):
+    with pytest.raises(ValueError):
+        ZoneEngine(zones=[{"name": "z", "points": points}])
+
+
+def test_rejects_bad_line_points():
+    with pytest.raises(ValueError):
+        ZoneEngine(lines=[{"name": "l", "start": [0.5], "end": [0.5, 1.0]}])
+
+
+def test_rejects_duplicate_names():
+    with pytest.raises(ValueError):
+        ZoneEngine(zones=[SQUARE, dict(SQUARE)])
+    with pytest.raises(ValueError):
+        ZoneEngine(lines=[WIRE, dict(WIRE)])